@@ -6,12 +6,22 @@ Central configuration for the danger zone alert system.
 # Video configuration
 VIDEO_PATH = "./path/to/input_video.mp4"
 OUTPUT_PATH = None  # Set to a path to save output video, None to skip
+HW_ACCEL = True  # Try hardware video decoding/encoding (NVDEC/NVENC/VAAPI/D3D11), falls back to software
 
 # YOLO configuration
 YOLO_MODEL = "yolo11n.pt"
 YOLO_CLASS = [0]  # Class 0 = person
 YOLO_CONFIDENCE = 0.4
 YOLO_PERSIST = True
+YOLO_IMGSZ = 640  # Inference image size
+RESIZE_BEFORE_INFERENCE = True  # Downscale frames to YOLO_IMGSZ with OpenCV before inference
+YOLO_HALF = True  # FP16 inference (CUDA only, ignored on CPU)
+YOLO_TENSORRT = True  # Export to a TensorRT engine once per batch/imgsz/precision and load it (falls back to .pt)
+BATCH_SIZE = 4  # Frames per inference call (larger = more throughput, more latency)
+
+# Pipeline configuration
+PIPELINE_QUEUE_SIZE = 4  # Frames buffered between pipeline stages
+MAX_FRAME_DROP = 0  # Frames skipped at once when falling behind real time (0 = analyze every frame)
 
 # Quadrilateral mask configuration
 MASK_ALPHA = 0.25  # Transparency of the mask (0.0 to 1.0)
@@ -24,9 +34,14 @@ DANGER_POINT_COLOR = (0, 0, 255)  # Red circle for danger zone
 SAFE_POINT_RADIUS = 6
 DANGER_POINT_RADIUS = 8
 
+# Danger zone configuration
+ZONE_POINTS = None  # Four (x, y) points to skip interactive drawing, e.g. [(100, 400), (500, 400), (600, 700), (50, 700)]
+
 # Display configuration
 DISPLAY_WINDOW_NAME = "Danger Zone Alert System"
 DISPLAY_FPS = 30
+DISPLAY_EVERY_N = 1  # Show every Nth processed frame
+HEADLESS = False  # Run without any windows (requires ZONE_POINTS)
 
 # Alert configuration
 SHOW_ALERTS = True
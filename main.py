@@ -3,15 +3,80 @@ Danger Zone Alert System
 Main entry point for the danger zone detection and alert system.
 """
 
+import os
 import cv2
 import sys
+import signal
+import threading
+import torch
+import numpy as np
 from ultralytics import YOLO
 from quadrilateral_tracker import QuadrilateralTracker
 from zone_alert_manager import ZoneAlertManager
+from pipeline import DetectionPipeline
 from utils import Logger, VideoWriter, get_frame_info
 import config
 
 
+def load_yolo_model(logger):
+    """
+    Load the YOLO model, exporting it to a TensorRT engine first if enabled.
+    
+    The export runs once per export setting; the engine file name includes
+    the batch size, image size and precision it was built for, so changing
+    any of them in config.py builds a new engine instead of reusing a stale
+    one. Uses the PyTorch model when CUDA is unavailable or the engine can't
+    be exported or loaded (e.g. TensorRT not installed or upgraded).
+    
+    Args:
+        logger (Logger): Logger instance
+    
+    Returns:
+        YOLO: Loaded model
+    """
+    model_path = config.YOLO_MODEL
+    
+    if config.YOLO_TENSORRT and model_path.endswith('.pt'):
+        if not torch.cuda.is_available():
+            # TensorRT engines need an NVIDIA GPU
+            logger.info("CUDA not available, using PyTorch model instead of TensorRT")
+        else:
+            precision = 'fp16' if config.YOLO_HALF else 'fp32'
+            engine_path = (f"{os.path.splitext(model_path)[0]}"
+                           f"_b{config.BATCH_SIZE}_{config.YOLO_IMGSZ}_{precision}.engine")
+            if not os.path.exists(engine_path):
+                logger.info(f"Exporting {model_path} to TensorRT engine (one-time)...")
+                try:
+                    # Dynamic shapes so partial batches at the end of the video still run
+                    exported_path = YOLO(model_path).export(
+                        format='engine',
+                        half=config.YOLO_HALF,
+                        dynamic=True,
+                        batch=config.BATCH_SIZE,
+                        imgsz=config.YOLO_IMGSZ,
+                        device=0
+                    )
+                    os.replace(exported_path, engine_path)
+                except Exception as e:
+                    logger.warning(f"TensorRT export failed, using PyTorch model: {str(e)}")
+                    engine_path = None
+            
+            if engine_path:
+                try:
+                    logger.info(f"Loading YOLO model: {engine_path}")
+                    model = YOLO(engine_path, task='detect')
+                    # Engines are deserialized on first use, so run one dummy frame
+                    # here where a failure can still fall back to the .pt weights
+                    model.predict(np.zeros((config.YOLO_IMGSZ, config.YOLO_IMGSZ, 3), dtype=np.uint8),
+                                  imgsz=config.YOLO_IMGSZ, verbose=False)
+                    return model
+                except Exception as e:
+                    logger.warning(f"Failed to load TensorRT engine, using PyTorch model: {str(e)}")
+    
+    logger.info(f"Loading YOLO model: {model_path}")
+    return YOLO(model_path, task='detect')
+
+
 def main():
     """Main execution function"""
     
@@ -19,17 +84,24 @@ def main():
     logger = Logger()
     logger.info("Starting Danger Zone Alert System...")
     
+    if config.DISPLAY_EVERY_N < 1:
+        logger.error("DISPLAY_EVERY_N must be at least 1")
+        return
+    
+    if config.ZONE_POINTS and len(config.ZONE_POINTS) != 4:
+        logger.error(f"ZONE_POINTS must contain exactly 4 points, got {len(config.ZONE_POINTS)}")
+        return
+    
     # Load YOLO model
-    logger.info(f"Loading YOLO model: {config.YOLO_MODEL}")
     try:
-        model = YOLO(config.YOLO_MODEL)
+        model = load_yolo_model(logger)
     except Exception as e:
         logger.error(f"Failed to load YOLO model: {str(e)}")
         return
     
     # Initialize video capture
     logger.info(f"Opening video: {config.VIDEO_PATH}")
-    tracker = QuadrilateralTracker(config.VIDEO_PATH)
+    tracker = QuadrilateralTracker(config.VIDEO_PATH, hw_accel=config.HW_ACCEL)
     
     # Get first frame and let user draw quadrilateral
     first_frame = tracker.get_first_frame()
@@ -39,20 +111,30 @@ def main():
     
     logger.info(f"Video resolution: {first_frame.shape[1]}x{first_frame.shape[0]}")
     
+    if config.ZONE_POINTS:
+        # Preconfigured danger zone
+        tracker.set_quadrilateral_points([tuple(point) for point in config.ZONE_POINTS])
+        logger.info(f"Using configured danger zone: {tracker.get_quadrilateral_points()}")
+    elif config.HEADLESS:
+        logger.error("Headless mode requires ZONE_POINTS to be set in config.py")
+        tracker.release()
+        return
     # Interactive quadrilateral drawing
-    if not tracker.draw_quadrilateral():
+    elif not tracker.draw_quadrilateral():
         logger.warning("User cancelled quadrilateral drawing")
         tracker.release()
+        cv2.destroyAllWindows()
         return
     
     # Show preview
-    logger.info("Displaying first frame with quadrilateral mask...")
-    result_image = tracker.apply_quadrilateral_mask(first_frame, alpha=config.MASK_ALPHA,
-                                                     mask_color=config.MASK_COLOR,
-                                                     border_color=config.BORDER_COLOR)
-    cv2.imshow("First Frame Preview", result_image)
-    cv2.waitKey(2000)
-    cv2.destroyWindow("First Frame Preview")
+    if not config.HEADLESS:
+        logger.info("Displaying first frame with quadrilateral mask...")
+        result_image = tracker.apply_quadrilateral_mask(first_frame, alpha=config.MASK_ALPHA,
+                                                         mask_color=config.MASK_COLOR,
+                                                         border_color=config.BORDER_COLOR)
+        cv2.imshow("First Frame Preview", result_image)
+        cv2.waitKey(2000)
+        cv2.destroyWindow("First Frame Preview")
     
     # Initialize zone alert manager
     alert_manager = ZoneAlertManager(tracker)
@@ -70,46 +152,62 @@ def main():
             config.OUTPUT_PATH,
             video_info['fps'],
             video_info['width'],
-            video_info['height']
+            video_info['height'],
+            hw_accel=config.HW_ACCEL
         )
+        if config.MAX_FRAME_DROP > 0:
+            logger.warning("MAX_FRAME_DROP is enabled: dropped frames are missing from the "
+                           "output video, which is written at the source FPS and will play too fast")
     
     # Main processing loop
     logger.info("Starting video processing...")
-    logger.info("Press 'Q' to stop processing\n")
+    
+    # Without a window to press 'Q' in, Ctrl+C finishes the current frame and
+    # stops cleanly; a second Ctrl+C interrupts immediately
+    stop_event = threading.Event()
+    if config.HEADLESS:
+        def request_stop(signum, frame):
+            stop_event.set()
+            signal.signal(signal.SIGINT, signal.default_int_handler)
+        
+        signal.signal(signal.SIGINT, request_stop)
+        logger.info("Running headless, press Ctrl+C to stop processing\n")
+    else:
+        logger.info("Press 'Q' to stop processing\n")
+    
+    # Decode, detection and annotation run on worker threads; display and
+    # writing stay on the main thread as required by OpenCV's GUI
+    pipeline = DetectionPipeline(
+        tracker.cap,
+        model,
+        tracker,
+        alert_manager,
+        batch_size=config.BATCH_SIZE,
+        queue_size=config.PIPELINE_QUEUE_SIZE,
+        inference_size=config.YOLO_IMGSZ if config.RESIZE_BEFORE_INFERENCE else None,
+        source_fps=video_info['fps'],
+        max_frame_drop=config.MAX_FRAME_DROP,
+        track_kwargs={
+            'persist': config.YOLO_PERSIST,
+            'classes': config.YOLO_CLASS,
+            'conf': config.YOLO_CONFIDENCE,
+            'imgsz': config.YOLO_IMGSZ,
+            'half': config.YOLO_HALF and torch.cuda.is_available(),  # FP16 is CUDA only
+            'verbose': False
+        },
+        mask_kwargs={
+            'alpha': config.MASK_ALPHA,
+            'mask_color': config.MASK_COLOR,
+            'border_color': config.BORDER_COLOR
+        }
+    )
     
     frame_count = 0
     try:
-        while tracker.cap.isOpened():
-            success, frame = tracker.cap.read()
-            
-            if not success:
-                break
-            
+        pipeline.start()
+        for frame_id, annotated_frame, alerts in pipeline.results():
             frame_count += 1
             
-            # Run YOLO tracking
-            results = model.track(
-                frame,
-                persist=config.YOLO_PERSIST,
-                classes=config.YOLO_CLASS,
-                conf=config.YOLO_CONFIDENCE,
-                verbose=False
-            )
-            
-            # Use original frame instead of YOLO plot (zone_alert_manager will draw all annotations with speed/distance)
-            annotated_frame = frame.copy()
-            
-            # Apply quadrilateral mask
-            annotated_frame = tracker.apply_quadrilateral_mask(
-                annotated_frame,
-                alpha=config.MASK_ALPHA,
-                mask_color=config.MASK_COLOR,
-                border_color=config.BORDER_COLOR
-            )
-            
-            # Update zone alerts
-            annotated_frame, alerts = alert_manager.update(results[0], annotated_frame)
-            
             # Log alerts
             for alert in alerts:
                 alert_manager.log_alert(alert)
@@ -118,17 +216,23 @@ def main():
             if video_writer:
                 video_writer.write(annotated_frame)
             
-            # Display frame
-            cv2.imshow(config.DISPLAY_WINDOW_NAME, annotated_frame)
-            
             # Log progress every 30 frames
             if frame_count % 30 == 0:
                 logger.info(f"Processed {frame_count} frames...")
             
-            # Check for exit key
-            if cv2.waitKey(1) & 0xFF == ord('q'):
+            if stop_event.is_set():
                 logger.info("User stopped processing")
                 break
+            
+            # Display every Nth frame; waitKey pumps the GUI and can block for
+            # several milliseconds, so it stays off frames that aren't shown
+            if not config.HEADLESS and frame_count % config.DISPLAY_EVERY_N == 0:
+                cv2.imshow(config.DISPLAY_WINDOW_NAME, annotated_frame)
+                
+                # Check for exit key
+                if cv2.waitKey(1) & 0xFF == ord('q'):
+                    logger.info("User stopped processing")
+                    break
     
     except KeyboardInterrupt:
         logger.warning("Processing interrupted by user")
@@ -139,17 +243,25 @@ def main():
         # Cleanup
         logger.info("Cleaning up...")
         
+        # Stop worker threads before touching shared state
+        pipeline.stop()
+        alert_manager.close()
+        
         # Finalize any persons still in zone at video end
         alert_manager.finalize_zone_exits()
         
         tracker.release()
         if video_writer:
             video_writer.release()
-        cv2.destroyAllWindows()
+        # Headless OpenCV builds have no GUI backend and raise here
+        if not config.HEADLESS:
+            cv2.destroyAllWindows()
         
         # Print statistics
         alert_manager.print_statistics()
         logger.info(f"Total frames processed: {frame_count}")
+        if config.MAX_FRAME_DROP > 0:
+            logger.info(f"Frames dropped to keep up with real time: {pipeline.dropped_frames}")
         logger.info("Danger Zone Alert System stopped")
 
 
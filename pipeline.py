@@ -0,0 +1,255 @@
+"""
+Pipeline Module
+Runs frame decoding, YOLO tracking and annotation as concurrent stages.
+"""
+
+import cv2
+import time
+import queue
+import threading
+from utils import AsyncVideoCapture
+
+
+# Marks the end of the frame stream between stages
+_END_OF_STREAM = object()
+
+
+class DetectionPipeline:
+    """
+    Threaded producer/consumer pipeline for video processing.
+
+    Stages are connected by bounded queues and run concurrently, so throughput
+    is limited by the slowest stage instead of the sum of all stages:
+    - decoder: prefetches frames from the video capture (AsyncVideoCapture),
+      dropping frames when processing falls behind real time if enabled
+    - detector: runs YOLO tracking on batches of frames
+    - annotator: applies the zone mask and updates zone alerts, handing the
+      drawing to the alert manager's annotation worker
+
+    The final stage (display and video writing) runs on the calling thread via
+    results(), since OpenCV's GUI functions must be used from the main thread.
+    """
+
+    def __init__(self, cap, model, tracker, alert_manager, batch_size=1, queue_size=4,
+                 track_kwargs=None, mask_kwargs=None, inference_size=None,
+                 source_fps=None, max_frame_drop=0):
+        """
+        Initialize the pipeline.
+
+        Args:
+            cap (cv2.VideoCapture): Video capture to read frames from
+            model: YOLO model used for tracking
+            tracker: QuadrilateralTracker instance
+            alert_manager: ZoneAlertManager instance
+            batch_size (int): Maximum number of frames per inference call. Default: 1
+            queue_size (int): Maximum number of items buffered between stages. Default: 4
+            track_kwargs (dict): Keyword arguments passed to model.track
+            mask_kwargs (dict): Keyword arguments passed to tracker.apply_quadrilateral_mask
+            inference_size (int): Downscale frames so their longer side is at most this
+                many pixels before inference (None to pass full frames). Default: None
+            source_fps (float): Frame rate of the video, used to detect falling behind
+            max_frame_drop (int): Maximum frames skipped at once when processing falls
+                behind real time (0 processes every frame). Default: 0
+        """
+        self.cap = cap
+        self.model = model
+        self.tracker = tracker
+        self.alert_manager = alert_manager
+        self.batch_size = max(1, batch_size)
+        self.track_kwargs = track_kwargs or {}
+        self.mask_kwargs = mask_kwargs or {}
+        self.inference_size = inference_size
+        self.source_fps = source_fps
+        self.max_frame_drop = max_frame_drop
+
+        self._capture = None
+        self._detected = queue.Queue(maxsize=queue_size)  # (frame_id, frame_index, frame, results, box_scale)
+        self._annotated = queue.Queue(maxsize=queue_size)  # (frame_id, annotation future, alerts)
+
+        self._stop_event = threading.Event()
+        self._threads = []
+        self.error = None
+
+    def start(self):
+        """Start the decoder, detector and annotator threads"""
+        # Prefetch at least one full batch
+        self._capture = AsyncVideoCapture(self.cap, queue_size=max(2, self.batch_size),
+                                          source_fps=self.source_fps,
+                                          max_drop=self.max_frame_drop)
+
+        stages = (
+            ("detector", self._detect, self._detected),
+            ("annotator", self._annotate, self._annotated),
+        )
+        for name, target, output_queue in stages:
+            thread = threading.Thread(target=self._run_stage, args=(target, output_queue),
+                                      name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def results(self):
+        """
+        Yield processed frames in their original order.
+
+        Yields:
+            tuple: (frame_id, annotated_frame, alerts_triggered)
+
+        Raises:
+            Exception: Re-raises the first error that occurred in a worker stage
+        """
+        pending = {}
+        next_id = 0
+        last_yield_time = None
+        while True:
+            item = self._get(self._annotated)
+            if item is _END_OF_STREAM:
+                break
+
+            frame_id, annotation, alerts = item
+            pending[frame_id] = (annotation, alerts)
+
+            # Release frames only once every earlier frame has been released
+            while next_id in pending:
+                annotation, alerts = pending.pop(next_id)
+                yield next_id, annotation.result(), alerts
+                next_id += 1
+
+                # The time between consecutive frames covers every stage and the
+                # caller's own display/writing, which is what frame dropping needs
+                now = time.perf_counter()
+                if last_yield_time is not None:
+                    self._capture.report_processing_time(now - last_yield_time)
+                last_yield_time = now
+
+        if self.error is not None:
+            raise self.error
+
+    @property
+    def dropped_frames(self):
+        """Number of frames skipped by the decoder to keep up with real time"""
+        if self._capture is None:
+            return 0
+        return self._capture.dropped_frames
+
+    def stop(self):
+        """Stop all stages and wait for their threads to finish"""
+        self._stop_event.set()
+        if self._capture is not None:
+            self._capture.stop()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def _run_stage(self, target, output_queue):
+        """Run a stage and always signal the end of stream downstream"""
+        try:
+            target()
+        except Exception as e:
+            if self.error is None:
+                self.error = e
+            self._stop_event.set()
+        finally:
+            self._put(output_queue, _END_OF_STREAM)
+
+    def _detect(self):
+        """Detector stage: run YOLO tracking on batches of decoded frames"""
+        frame_id = 0
+        end_of_stream = False
+        while not end_of_stream and not self._stop_event.is_set():
+            # Wait for the first frame, then batch whatever is already decoded
+            batch = []
+            while len(batch) < self.batch_size and (not batch or self._capture.frames_ready()):
+                success, frame, frame_index = self._capture.read_with_index()
+                if not success:
+                    end_of_stream = True
+                    break
+                batch.append((frame_id, frame_index, frame))
+                frame_id += 1
+
+            if not batch:
+                break
+
+            inputs = [self._prepare_input(frame) for _, _, frame in batch]
+            results_list = self.model.track([image for image, _ in inputs], **self.track_kwargs)
+
+            for (batch_frame_id, frame_index, frame), (_, box_scale), results in zip(batch, inputs, results_list):
+                if not self._put(self._detected, (batch_frame_id, frame_index, frame, results, box_scale)):
+                    return
+
+            # Don't keep the batch's results (and their device tensors) alive
+            # while waiting for the next batch to be decoded
+            batch = inputs = results_list = results = None
+
+    def _prepare_input(self, frame):
+        """
+        Downscale a frame to the inference size.
+
+        YOLO resizes every input to its inference size internally; doing it
+        here with cv2.resize keeps the full resolution frame out of the
+        framework's preprocessing. The aspect ratio is kept, so YOLO only pads.
+
+        Args:
+            frame (np.ndarray): Full resolution frame
+
+        Returns:
+            tuple: (inference_image, box_scale) where box_scale is the (x, y) factor
+                mapping box coordinates back to the full frame, or None if unscaled
+        """
+        height, width = frame.shape[:2]
+        if not self.inference_size or max(height, width) <= self.inference_size:
+            return frame, None
+
+        scale = self.inference_size / max(height, width)
+        new_width = max(1, round(width * scale))
+        new_height = max(1, round(height * scale))
+        image = cv2.resize(frame, (new_width, new_height), interpolation=cv2.INTER_LINEAR)
+        return image, (width / new_width, height / new_height)
+
+    def _annotate(self):
+        """Annotator stage: apply the zone mask and update zone alerts"""
+        while True:
+            item = self._get(self._detected)
+            if item is _END_OF_STREAM:
+                break
+
+            frame_id, frame_index, frame, results, box_scale = item
+            # Decoded frames are owned by the pipeline, so draw on them directly
+            annotated_frame = self.tracker.apply_quadrilateral_mask(frame, inplace=True,
+                                                                    **self.mask_kwargs)
+            # Drawing continues on the alert manager's worker while this stage
+            # moves on to the next frame; results() waits for it
+            annotation, alerts = self.alert_manager.update_async(results, annotated_frame,
+                                                                 box_scale=box_scale,
+                                                                 frame_idx=frame_index)
+            # Release the YOLO results as soon as their boxes have been read
+            item = results = None
+
+            if not self._put(self._annotated, (frame_id, annotation, alerts)):
+                break
+
+    def _put(self, target_queue, item):
+        """
+        Put an item on a queue, giving up if the pipeline is stopped.
+
+        Returns:
+            bool: True if the item was queued, False if the pipeline was stopped
+        """
+        while not self._stop_event.is_set():
+            try:
+                target_queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, source_queue):
+        """
+        Get an item from a queue, returning the end-of-stream marker if the
+        pipeline is stopped.
+        """
+        while not self._stop_event.is_set():
+            try:
+                return source_queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _END_OF_STREAM
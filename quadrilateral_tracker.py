@@ -3,8 +3,154 @@ Quadrilateral Tracker Module
 Handles interactive quadrilateral drawing and masking for video ROI definition.
 """
 
+import os
 import cv2
 import numpy as np
+from utils import NUMBA_AVAILABLE
+
+
+def open_video_capture(video_path, hw_accel=False):
+    """
+    Open a video file, preferring hardware accelerated decoding.
+    
+    Tries, in order:
+    1. FFmpeg backend with OpenCV's hardware acceleration properties
+       (NVDEC/VAAPI/D3D11, whichever is available)
+    2. FFmpeg backend forced onto the NVIDIA h264_cuvid decoder through
+       the OPENCV_FFMPEG_CAPTURE_OPTIONS environment variable
+    3. Plain software decoding
+    
+    For a fully GPU-resident pipeline, OpenCV builds with CUDA support can use
+    cv2.cudacodec.createVideoReader(video_path) instead; it returns frames as
+    cv2.cuda_GpuMat and skips the GPU->CPU readback done by cap.read().
+    
+    Args:
+        video_path (str): Path to the video file
+        hw_accel (bool): Try hardware decoding before software. Default: False
+    
+    Returns:
+        cv2.VideoCapture: Video capture object
+    """
+    if hw_accel:
+        # Hardware acceleration properties are available from OpenCV 4.5.2
+        if hasattr(cv2, "CAP_PROP_HW_ACCELERATION"):
+            cap = cv2.VideoCapture(video_path, cv2.CAP_FFMPEG, [
+                cv2.CAP_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY,
+                cv2.CAP_PROP_HW_DEVICE, 0
+            ])
+            if cap.isOpened():
+                return cap
+            cap.release()
+        
+        # Only use the environment workaround if the user hasn't set their own options
+        if "OPENCV_FFMPEG_CAPTURE_OPTIONS" not in os.environ:
+            os.environ["OPENCV_FFMPEG_CAPTURE_OPTIONS"] = "video_codec;h264_cuvid"
+            try:
+                cap = cv2.VideoCapture(video_path, cv2.CAP_FFMPEG)
+            finally:
+                del os.environ["OPENCV_FFMPEG_CAPTURE_OPTIONS"]
+            if cap.isOpened():
+                return cap
+            cap.release()
+        
+        print("Warning: Hardware decoding unavailable, falling back to software decoding")
+    
+    return cv2.VideoCapture(video_path)
+
+
+def points_in_quad_numpy(pts, quad):
+    """
+    Check which points lie inside a convex polygon using the half-plane sign test.
+    
+    A point is inside when the cross products of every edge with the vector
+    to the point share the same sign. Points on an edge count as inside.
+    
+    Args:
+        pts (np.ndarray): (N, 2) array of (x, y) coordinates
+        quad (np.ndarray): (M, 2) array of convex polygon vertices
+    
+    Returns:
+        np.ndarray: (N,) boolean array, True where the point is inside
+    """
+    edges = np.roll(quad, -1, axis=0) - quad
+    rel = pts[:, None, :] - quad[None, :, :]
+    cross = edges[None, :, 0] * rel[:, :, 1] - edges[None, :, 1] * rel[:, :, 0]
+    return (cross >= 0).all(axis=1) | (cross <= 0).all(axis=1)
+
+
+def is_convex_polygon(vertices):
+    """
+    Check whether polygon vertices (in drawing order) form a convex shape.
+    
+    Args:
+        vertices (np.ndarray): (M, 2) array of polygon vertices
+    
+    Returns:
+        bool: True if the polygon is convex, False if concave or self-intersecting
+    """
+    vertices = np.asarray(vertices, dtype=np.float64)
+    edges = np.roll(vertices, -1, axis=0) - vertices
+    next_edges = np.roll(edges, -1, axis=0)
+    turns = edges[:, 0] * next_edges[:, 1] - edges[:, 1] * next_edges[:, 0]
+    return bool((turns >= 0).all() or (turns <= 0).all())
+
+
+# Source template for make_quad_test; one line per edge with its constants baked in
+_QUAD_TEST_SOURCE = """
+def quad_test(px, py):
+{edges}
+    return ({all_pos}) | ({all_neg})
+"""
+
+
+def make_quad_test(quad):
+    """
+    Build a point-in-polygon test specialized for one fixed convex polygon.
+    
+    Each edge (x0, y0) -> (x1, y1) becomes the line A*x + B*y + C with
+    A = y1 - y0, B = x0 - x1, C = -A*x0 - B*y0, precomputed once. A point is
+    inside when every edge expression has the same sign, so each test is one
+    multiply-add per edge and a sign AND, with no branches.
+    
+    With Numba, the constants are written into generated source and compiled
+    into a ufunc, so they are literals in the machine code. Without Numba the
+    vectorized points_in_quad_numpy check is used instead.
+    
+    Compilation takes a moment, so build the test once when the zone changes.
+    
+    Args:
+        quad (np.ndarray): (M, 2) array of convex polygon vertices
+    
+    Returns:
+        callable: Function mapping an (N, 2) float64 array of points to an
+            (N,) boolean array, True where the point is inside
+    """
+    quad = np.asarray(quad, dtype=np.float64)
+    
+    if not NUMBA_AVAILABLE:
+        return lambda pts: points_in_quad_numpy(pts, quad)
+    
+    next_quad = np.roll(quad, -1, axis=0)
+    a = next_quad[:, 1] - quad[:, 1]
+    b = quad[:, 0] - next_quad[:, 0]
+    c = -a * quad[:, 0] - b * quad[:, 1]
+    
+    from numba import vectorize
+    
+    edges = "\n".join(f"    e{i} = {float(a[i])!r} * px + {float(b[i])!r} * py + {float(c[i])!r}" for i in range(len(quad)))
+    source = _QUAD_TEST_SOURCE.format(
+        edges=edges,
+        all_pos=" & ".join(f"(e{i} >= 0)" for i in range(len(quad))),
+        all_neg=" & ".join(f"(e{i} <= 0)" for i in range(len(quad))),
+    )
+    namespace = {}
+    exec(source, namespace)
+    quad_test_ufunc = vectorize(['boolean(float64, float64)'], fastmath=True)(namespace['quad_test'])
+    
+    def quad_test_jit(pts):
+        return quad_test_ufunc(pts[:, 0], pts[:, 1])
+    
+    return quad_test_jit
 
 
 class QuadrilateralTracker:
@@ -17,18 +163,42 @@ class QuadrilateralTracker:
     - Apply a semi-transparent mask overlay to frames
     """
     
-    def __init__(self, video_path):
+    def __init__(self, video_path, hw_accel=False):
         """
         Initialize the quadrilateral tracker.
         
         Args:
             video_path (str): Path to the video file
+            hw_accel (bool): Try hardware accelerated decoding. Default: False
         """
         self.video_path = video_path
-        self.cap = cv2.VideoCapture(video_path)
+        self.cap = open_video_capture(video_path, hw_accel=hw_accel)
         self.first_frame = None
         self.quadrilateral = []
         
+        # Cached vertex arrays (rebuilt when points change): int32 for OpenCV
+        # drawing/tests, float64 for the batched zone check
+        self._quad_i32 = None
+        self._quad_f64 = None
+        self._quad_convex = False
+        self._quad_bounds = None
+        self._quad_test = None
+        
+        # Cached polygon mask for the overlay (rebuilt when points or frame size change)
+        self._mask_cache = None
+        self._mask_shape = None
+        self._mask_roi = None
+        
+        # Cached color blend lookup table (rebuilt when alpha or color change)
+        self._blend_lut = None
+        self._blend_key = None
+        self._blend_scratch = None
+        
+        # Reusable frame-sized buffers for methods returning a modified copy.
+        # Their results alias these buffers and are overwritten by the next call.
+        self._scratch_a = None
+        self._scratch_b = None
+        
     def get_first_frame(self):
         """
         Extract the first frame from the video.
@@ -58,18 +228,20 @@ class QuadrilateralTracker:
         if event == cv2.EVENT_LBUTTONDOWN:
             if len(self.quadrilateral) < 4:
                 self.quadrilateral.append((x, y))
+                self._invalidate_quad_cache()
                 print(f"Point {len(self.quadrilateral)} added: ({x}, {y})")
                 self._update_display()
         
         elif event == cv2.EVENT_RBUTTONDOWN:
             if self.quadrilateral:
                 self.quadrilateral.pop()
+                self._invalidate_quad_cache()
                 print(f"Last point removed. Remaining points: {len(self.quadrilateral)}")
                 self._update_display()
     
     def _update_display(self):
         """Update the display with current quadrilateral points"""
-        frame_copy = self.first_frame.copy()
+        frame_copy = self._copy_to_scratch('_scratch_a', self.first_frame)
         
         # Draw all points
         for i, point in enumerate(self.quadrilateral):
@@ -116,7 +288,7 @@ class QuadrilateralTracker:
             key = cv2.waitKey(1) & 0xFF
             if key == 27:  # ESC
                 print("Drawing cancelled")
-                self.quadrilateral = []
+                self.reset_quadrilateral()
                 cv2.destroyWindow("Draw Quadrilateral - Left Click to Add Points")
                 return False
             elif key == 32:  # SPACE - confirm when 4 points are added
@@ -128,6 +300,7 @@ class QuadrilateralTracker:
                     print(f"⚠ Please add {remaining} more point(s) before pressing SPACE")
         
         print(f"✓ Quadrilateral points confirmed: {self.quadrilateral}\n")
+        self._get_quad_test()  # Compile the zone test now rather than on the first frame
         cv2.destroyWindow("Draw Quadrilateral - Left Click to Add Points")
         return True
     
@@ -145,7 +318,8 @@ class QuadrilateralTracker:
         print("=" * 60 + "\n")
     
     def apply_quadrilateral_mask(self, inference_image, alpha=0.3, 
-                                  mask_color=(200, 200, 100), border_color=(0, 255, 255)):
+                                  mask_color=(200, 200, 100), border_color=(0, 255, 255),
+                                  inplace=False):
         """
         Apply the quadrilateral as a light color mask on the inference image.
         
@@ -154,26 +328,30 @@ class QuadrilateralTracker:
             alpha (float): Transparency of the mask (0.0 to 1.0). Default: 0.3
             mask_color (tuple): BGR color for the mask overlay. Default: light cyan
             border_color (tuple): BGR color for the border. Default: yellow
+            inplace (bool): Draw directly on inference_image instead of a copy. Default: False
         
         Returns:
-            np.ndarray: Image with quadrilateral mask applied
+            np.ndarray: Image with quadrilateral mask applied. Unless inplace is set,
+                this is an internal buffer reused by the next call; copy it to keep it.
         """
         if len(self.quadrilateral) != 4:
             return inference_image
         
-        result = inference_image.copy()
-        
-        # Create a mask with the quadrilateral
-        mask = np.zeros(inference_image.shape[:2], dtype=np.uint8)
-        quad_points = np.array(self.quadrilateral, dtype=np.int32)
-        cv2.fillPoly(mask, [quad_points], 255)
+        result = inference_image if inplace else self._copy_to_scratch('_scratch_a', inference_image)
         
-        # Apply colored mask
-        overlay = result.copy()
-        overlay[mask == 255] = mask_color
+        # The quadrilateral is static, so its mask is rasterized once and reused
+        (rows, cols), mask = self._get_quad_mask(inference_image.shape[:2])
+        quad_points = self._get_quad_points()
         
-        # Blend with original image
-        result = cv2.addWeighted(result, 1 - alpha, overlay, alpha, 0)
+        # Blend the bounding rectangle through the lookup table with cv2.LUT
+        # (SIMD), then copy back only the pixels inside the quadrilateral
+        lut = self._get_blend_lut(alpha, mask_color)
+        roi = result[rows, cols]
+        if roi.size:
+            if self._blend_scratch is None or self._blend_scratch.shape != roi.shape:
+                self._blend_scratch = np.empty_like(roi)
+            cv2.LUT(roi, lut, dst=self._blend_scratch)
+            np.copyto(roi, self._blend_scratch, where=mask[..., None])
         
         # Draw quadrilateral border
         cv2.polylines(result, [quad_points], True, border_color, 2)
@@ -199,10 +377,135 @@ class QuadrilateralTracker:
         if len(points) != 4:
             print("Warning: Quadrilateral should have exactly 4 points")
         self.quadrilateral = points
+        self._invalidate_quad_cache()
+        if len(points) == 4:
+            self._get_quad_test()  # Compile the zone test now rather than on the first frame
     
     def reset_quadrilateral(self):
         """Reset the quadrilateral points"""
         self.quadrilateral = []
+        self._invalidate_quad_cache()
+    
+    def _copy_to_scratch(self, name, image):
+        """
+        Copy an image into a reusable scratch buffer, allocating it only when
+        the image shape or dtype changes.
+        
+        Args:
+            name (str): Attribute name of the scratch buffer
+            image (np.ndarray): Image to copy
+        
+        Returns:
+            np.ndarray: The scratch buffer holding a copy of image
+        """
+        buffer = getattr(self, name)
+        if buffer is None or buffer.shape != image.shape or buffer.dtype != image.dtype:
+            buffer = np.empty_like(image)
+            setattr(self, name, buffer)
+        np.copyto(buffer, image)
+        return buffer
+    
+    def _invalidate_quad_cache(self):
+        """Drop cached data derived from the quadrilateral points"""
+        self._quad_i32 = None
+        self._quad_f64 = None
+        self._quad_convex = False
+        self._quad_bounds = None
+        self._quad_test = None
+        self._mask_cache = None
+        self._mask_shape = None
+        self._mask_roi = None
+    
+    def _get_quad_mask(self, shape):
+        """
+        Get the cached mask of the quadrilateral for a frame size.
+        
+        The mask is cropped to the quadrilateral's bounding rectangle so
+        per-frame work only touches that region of the frame.
+        
+        Args:
+            shape (tuple): Frame shape (height, width)
+        
+        Returns:
+            tuple: (roi, mask) where roi is a (rows, cols) pair of slices into
+                the frame and mask is a boolean array of the ROI's shape,
+                True inside the quadrilateral
+        """
+        if self._mask_cache is None or self._mask_shape != shape:
+            quad_points = self._get_quad_points()
+            x, y, w, h = cv2.boundingRect(quad_points)
+            x0, y0 = max(x, 0), max(y, 0)
+            x1, y1 = min(x + w, shape[1]), min(y + h, shape[0])
+            
+            mask = np.zeros((max(y1 - y0, 0), max(x1 - x0, 0)), dtype=np.uint8)
+            cv2.fillPoly(mask, [(quad_points - (x0, y0)).astype(np.int32)], 255)
+            
+            self._mask_shape = shape
+            self._mask_roi = (slice(y0, y1), slice(x0, x1))
+            self._mask_cache = mask.astype(bool)
+        return self._mask_roi, self._mask_cache
+    
+    def _get_blend_lut(self, alpha, mask_color):
+        """
+        Get the cached lookup table blending pixels with the mask color.
+        
+        Entry [v, 0, c] holds round((1 - alpha) * v + alpha * mask_color[c]),
+        the same value cv2.addWeighted computes for that pixel.
+        
+        Args:
+            alpha (float): Transparency of the mask (0.0 to 1.0)
+            mask_color (tuple): BGR color for the mask overlay
+        
+        Returns:
+            np.ndarray: (256, 1, 3) uint8 lookup table for cv2.LUT
+        """
+        key = (alpha, tuple(mask_color))
+        if self._blend_key != key:
+            values = np.arange(256, dtype=np.float64)[:, None, None]
+            lut = (1 - alpha) * values + alpha * np.asarray(mask_color, dtype=np.float64)[None, None, :]
+            self._blend_lut = np.clip(np.rint(lut), 0, 255).astype(np.uint8)
+            self._blend_key = key
+        return self._blend_lut
+    
+    def _get_quad_points(self):
+        """
+        Get the quadrilateral vertices as a cached int32 array for OpenCV.
+        
+        Returns:
+            np.ndarray: (4, 2) int32 array of vertices
+        """
+        if self._quad_i32 is None:
+            self._quad_i32 = np.asarray(self.quadrilateral, dtype=np.int32)
+        return self._quad_i32
+    
+    def _get_quad_array(self):
+        """
+        Get the quadrilateral vertices as a cached float64 array.
+        
+        Returns:
+            np.ndarray: (4, 2) float64 array of vertices
+        """
+        if self._quad_f64 is None:
+            self._quad_f64 = self._get_quad_points().astype(np.float64)
+            self._quad_convex = is_convex_polygon(self._quad_f64)
+            x_min, y_min = self._quad_f64.min(axis=0)
+            x_max, y_max = self._quad_f64.max(axis=0)
+            self._quad_bounds = (x_min, y_min, x_max, y_max)
+        return self._quad_f64
+    
+    def _get_quad_test(self):
+        """
+        Get the zone test specialized for the current quadrilateral.
+        
+        Returns:
+            callable: Test built by make_quad_test, or None if the
+                quadrilateral is not convex
+        """
+        if self._quad_test is None:
+            quad = self._get_quad_array()
+            if self._quad_convex:
+                self._quad_test = make_quad_test(quad)
+        return self._quad_test
     
     def is_point_in_quadrilateral(self, point):
         """
@@ -217,10 +520,45 @@ class QuadrilateralTracker:
         if len(self.quadrilateral) != 4:
             return False
         
-        quad_points = np.array(self.quadrilateral, dtype=np.int32)
+        quad_points = self._get_quad_points()
         result = cv2.pointPolygonTest(quad_points, point, False)
         return result >= 0
     
+    def points_in_zone(self, points):
+        """
+        Check which of several points are inside the quadrilateral.
+        
+        Tests all points in one call instead of one OpenCV call per point.
+        
+        Args:
+            points (np.ndarray): (N, 2) array of (x, y) coordinates
+        
+        Returns:
+            np.ndarray: (N,) boolean array, True where the point is inside
+        """
+        points = np.ascontiguousarray(points, dtype=np.float64).reshape(-1, 2)
+        if len(self.quadrilateral) != 4:
+            return np.zeros(len(points), dtype=bool)
+        
+        # Cheap bounding box prefilter; only points inside it need the polygon test
+        self._get_quad_array()
+        x_min, y_min, x_max, y_max = self._quad_bounds
+        inside = ((points[:, 0] >= x_min) & (points[:, 0] <= x_max)
+                  & (points[:, 1] >= y_min) & (points[:, 1] <= y_max))
+        if not inside.any():
+            return inside
+        candidates = points[inside]
+        
+        quad_test = self._get_quad_test()
+        if quad_test is not None:
+            inside[inside] = quad_test(candidates)
+        else:
+            # The half-plane test only holds for convex shapes
+            quad_points = self._get_quad_points()
+            inside[inside] = [cv2.pointPolygonTest(quad_points, (float(x), float(y)), False) >= 0
+                              for x, y in candidates]
+        return inside
+    
     def get_bbox_bottom_center(self, bbox):
         """
         Get the center point of the bottom line of a bounding box.
@@ -231,10 +569,26 @@ class QuadrilateralTracker:
         Returns:
             tuple: (center_x, center_y) of the bottom line
         """
-        x1, y1, x2, y2 = bbox[:4]
-        center_x = (x1 + x2) / 2
-        center_y = y2  # Bottom of the bbox
-        return (int(center_x), int(center_y))
+        # Integer midpoint, consistent with bbox_bottom_centers
+        return ((int(bbox[0]) + int(bbox[2])) >> 1, int(bbox[3]))
+    
+    def bbox_bottom_centers(self, xyxy):
+        """
+        Get the bottom center points of several bounding boxes at once.
+        
+        Vectorized version of get_bbox_bottom_center.
+        
+        Args:
+            xyxy (np.ndarray): (N, 4) array of bounding boxes [x1, y1, x2, y2]
+        
+        Returns:
+            np.ndarray: (N, 2) int32 array of (center_x, center_y) points
+        """
+        xyxy = np.asarray(xyxy).reshape(-1, 4).astype(np.int32)
+        centers = np.empty((len(xyxy), 2), dtype=np.int32)
+        centers[:, 0] = (xyxy[:, 0] + xyxy[:, 2]) >> 1
+        centers[:, 1] = xyxy[:, 3]
+        return centers
     
     def is_bbox_in_zone(self, bbox):
         """
@@ -265,10 +619,11 @@ class QuadrilateralTracker:
             radius (int): Radius of the circle. Default: 5
         
         Returns:
-            np.ndarray: Image with bottom center point drawn
+            np.ndarray: Image with bottom center point drawn. This is an internal
+                buffer reused by the next call; copy it to keep it.
         """
         bottom_center = self.get_bbox_bottom_center(bbox)
-        result = image.copy()
+        result = self._copy_to_scratch('_scratch_b', image)
         cv2.circle(result, bottom_center, radius, color, -1)
         return result
     
@@ -277,6 +632,5 @@ class QuadrilateralTracker:
         self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
     
     def release(self):
-        """Release video capture and close all windows"""
+        """Release video capture"""
         self.cap.release()
-        cv2.destroyAllWindows()
@@ -4,13 +4,30 @@ Helper functions for the danger zone alert system.
 """
 
 import cv2
+import math
+import time
+import queue
+import atexit
+import threading
 from datetime import datetime
 
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+    
+    def njit(*args, **kwargs):
+        """Fallback for numba.njit when Numba is not installed: run as plain Python"""
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda func: func
+
 
 class VideoWriter:
     """Handle video file writing"""
     
-    def __init__(self, output_path, fps, frame_width, frame_height, codec='mp4v'):
+    def __init__(self, output_path, fps, frame_width, frame_height, codec='mp4v', hw_accel=False):
         """
         Initialize video writer.
         
@@ -19,13 +36,51 @@ class VideoWriter:
             fps (float): Frames per second
             frame_width (int): Frame width
             frame_height (int): Frame height
-            codec (str): Video codec
+            codec (str): Video codec (used for software encoding)
+            hw_accel (bool): Try hardware H.264 encoding first (e.g. NVENC). Default: False
         """
         self.output_path = output_path
-        fourcc = cv2.VideoWriter_fourcc(*codec)
-        self.writer = cv2.VideoWriter(output_path, fourcc, fps, (frame_width, frame_height))
+        self.writer = None
+        if hw_accel:
+            self.writer = self._open_hw_writer(output_path, fps, frame_width, frame_height)
+        if self.writer is None:
+            fourcc = cv2.VideoWriter_fourcc(*codec)
+            self.writer = cv2.VideoWriter(output_path, fourcc, fps, (frame_width, frame_height))
         self.frame_count = 0
     
+    @staticmethod
+    def _open_hw_writer(output_path, fps, frame_width, frame_height):
+        """
+        Open an H.264 writer on the FFmpeg backend with hardware acceleration.
+        
+        OpenCV builds with CUDA support can alternatively use
+        cv2.cudacodec.createVideoWriter to encode cv2.cuda_GpuMat frames
+        directly, without downloading them to the CPU first.
+        
+        Returns:
+            cv2.VideoWriter: Opened writer, or None if hardware encoding is unavailable
+        """
+        # Hardware acceleration properties are available from OpenCV 4.5.2
+        if not hasattr(cv2, "VIDEOWRITER_PROP_HW_ACCELERATION"):
+            return None
+        
+        try:
+            writer = cv2.VideoWriter(
+                output_path,
+                cv2.CAP_FFMPEG,
+                cv2.VideoWriter_fourcc(*'avc1'),
+                fps,
+                (frame_width, frame_height),
+                [cv2.VIDEOWRITER_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY]
+            )
+        except cv2.error:
+            return None
+        
+        if not writer.isOpened():
+            writer.release()
+            return None
+        return writer
+    
     def write(self, frame):
         """
         Write a frame to the video.
@@ -53,18 +108,159 @@ class VideoWriter:
             pass
 
 
+class AsyncVideoCapture:
+    """
+    Decode video frames on a background thread.
+    
+    Frames are prefetched into a small bounded queue, so decoding the next
+    frame overlaps with whatever the caller does with the current one.
+    
+    When the caller reports that it processes frames slower than the source
+    frame rate, up to max_drop frames are skipped with cap.grab() (which
+    doesn't decode) before each read, to keep up with real time.
+    """
+    
+    # Smoothing factor for the processing time moving average
+    EWMA_ALPHA = 0.1
+    
+    def __init__(self, cap, queue_size=2, source_fps=None, max_drop=0):
+        """
+        Initialize and start the reader thread.
+        
+        Args:
+            cap (cv2.VideoCapture): Opened video capture to read from
+            queue_size (int): Maximum number of prefetched frames. Default: 2
+            source_fps (float): Frame rate of the source, needed for frame dropping
+            max_drop (int): Maximum frames skipped before each read (0 disables). Default: 0
+        """
+        self.cap = cap
+        self.max_drop = max_drop
+        self.frame_period = 1.0 / source_fps if source_fps else None
+        self.processing_time = None  # Moving average of seconds per processed frame
+        self.dropped_frames = 0
+        
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._reader, name="decoder", daemon=True)
+        self._thread.start()
+    
+    def report_processing_time(self, seconds):
+        """
+        Report how long the caller took to process one frame.
+        
+        Args:
+            seconds (float): Processing time of the latest frame
+        """
+        if self.processing_time is None:
+            self.processing_time = seconds
+        else:
+            self.processing_time += self.EWMA_ALPHA * (seconds - self.processing_time)
+    
+    def _frames_to_drop(self):
+        """
+        Get the number of frames to skip to keep up with the source frame rate.
+        
+        Returns:
+            int: Number of frames to grab without decoding
+        """
+        if not self.max_drop or not self.frame_period or self.processing_time is None:
+            return 0
+        if self.processing_time <= self.frame_period:
+            return 0
+        return min(self.max_drop, math.ceil(self.processing_time / self.frame_period) - 1)
+    
+    def _reader(self):
+        """Read frames until the end of the video or until stopped"""
+        frame_index = 0
+        while not self._stop_event.is_set():
+            success = True
+            for _ in range(self._frames_to_drop()):
+                success = self.cap.grab()
+                if not success:
+                    break
+                frame_index += 1
+                self.dropped_frames += 1
+            
+            frame = None
+            if success:
+                success, frame = self.cap.read()
+            
+            while not self._stop_event.is_set():
+                try:
+                    self._queue.put((success, frame, frame_index), timeout=0.1)
+                    break
+                except queue.Full:
+                    continue
+            if not success:
+                break
+            frame_index += 1
+    
+    def read(self):
+        """
+        Get the next decoded frame, waiting for it if necessary.
+        
+        Returns:
+            tuple: (success, frame) like cv2.VideoCapture.read
+        """
+        success, frame, _ = self.read_with_index()
+        return success, frame
+    
+    def read_with_index(self):
+        """
+        Get the next decoded frame and its position in the video.
+        
+        Returns:
+            tuple: (success, frame, frame_index) where frame_index counts
+                dropped frames too
+        """
+        while True:
+            try:
+                return self._queue.get(timeout=0.1)
+            except queue.Empty:
+                if not self._thread.is_alive() and self._queue.empty():
+                    return False, None, None
+    
+    def frames_ready(self):
+        """
+        Check whether a decoded frame is available without waiting.
+        
+        Returns:
+            bool: True if read() would return immediately
+        """
+        return not self._queue.empty()
+    
+    def stop(self):
+        """Stop the reader thread (the underlying capture is not released)"""
+        self._stop_event.set()
+        self._thread.join()
+
+
 class Logger:
     """Simple logging utility"""
     
-    def __init__(self, log_file=None):
+    def __init__(self, log_file=None, flush_every=20):
         """
         Initialize logger.
         
         Args:
             log_file (str): Path to log file (optional)
+            flush_every (int): Flush the log file after this many messages.
+                Errors and alerts are always flushed immediately. Default: 20
         """
         self.log_file = log_file
         self.logs = []
+        self.flush_every = flush_every
+        
+        # Keep the log file open instead of reopening it for every message
+        self._file = None
+        self._unflushed = 0
+        if log_file:
+            self._file = open(log_file, 'a', buffering=8192)
+            atexit.register(self.close)
+        
+        # Timestamp string of the current second, reused for messages within it
+        self._last_second = None
+        self._last_timestamp = None
     
     def log(self, message, level="INFO"):
         """
@@ -74,15 +270,27 @@ class Logger:
             message (str): Message to log
             level (str): Log level (INFO, WARNING, ERROR, ALERT)
         """
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        log_message = f"[{timestamp}] [{level}] {message}"
+        second = int(time.time())
+        if second != self._last_second:
+            self._last_second = second
+            self._last_timestamp = datetime.fromtimestamp(second).strftime("%Y-%m-%d %H:%M:%S")
+        log_message = f"[{self._last_timestamp}] [{level}] {message}"
         
         print(log_message)
         self.logs.append(log_message)
         
-        if self.log_file:
-            with open(self.log_file, 'a') as f:
-                f.write(log_message + "\n")
+        if self._file:
+            self._file.write(log_message + "\n")
+            self._unflushed += 1
+            if level in ("ERROR", "ALERT") or self._unflushed >= self.flush_every:
+                self._file.flush()
+                self._unflushed = 0
+    
+    def close(self):
+        """Flush and close the log file"""
+        if self._file:
+            self._file.close()
+            self._file = None
     
     def info(self, message):
         """Log info message"""
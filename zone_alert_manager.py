@@ -5,14 +5,32 @@ Manages detection, alerting, and tracking of persons in danger zones.
 
 import cv2
 import time
+import numpy as np
 from datetime import datetime
-from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from utils import njit, NUMBA_AVAILABLE
 
 # ================================
 # Speed Tracking Configuration
 # ================================
 FPS = 30  # Frame per second of video
 FRAME_SKIP = 5  # Frames to skip between speed calculations
+WINDOW = 8  # Number of (frame, distance) samples kept per track for speed smoothing
+MAX_TRACKS = 256  # Initial number of speed history slots (grown when all are in use)
+TEXT_SIZE_CACHE_LIMIT = 1024  # Maximum number of cached label text sizes
+ALERT_BANNER_CACHE_LIMIT = 64  # Maximum number of cached alert banners (one per person count)
+HISTORY_INITIAL_CAPACITY = 64  # Initial capacity of the violation history arrays (doubled when full)
+
+# Violation history fields, one numpy array each (NaN stands for a missing value)
+HISTORY_FIELDS = (
+    ('track_id', np.int64),
+    ('entry_time', np.float64),
+    ('exit_time', np.float64),
+    ('duration', np.float64),
+    ('max_speed', np.float64),
+    ('last_distance', np.float64),
+    ('total_distance', np.float64),
+)
 
 # Calibration constants for distance estimation
 # These are based on height of person and pixel height at reference distance
@@ -41,48 +59,165 @@ def estimate_distance_from_bbox(bbox):
     return K / pixel_height  # meters
 
 
-def estimate_speed(track_id, frame_idx, distance, track_history):
+@njit(cache=True)
+def distances_from_heights(heights, k):
+    """
+    Estimate distances from camera for several bounding box heights at once.
+    
+    Args:
+        heights (np.ndarray): (N,) float64 array of bbox heights in pixels
+        k (float): Calibration constant (REAL_HEIGHT * PIXEL_HEIGHT_REF)
+    
+    Returns:
+        np.ndarray: (N,) float64 array of distances in meters, NaN where invalid
+    """
+    distances = np.empty(heights.shape[0], dtype=np.float64)
+    for i in range(heights.shape[0]):
+        if heights[i] > 0:
+            distances[i] = k / heights[i]
+        else:
+            distances[i] = np.nan
+    return distances
+
+
+@njit(cache=True)
+def _speed_kernel(history, count, head, fps):
+    """
+    Average speed over consecutive samples of a track's distance history.
+    
+    Args:
+        history (np.ndarray): (WINDOW, 2) float64 ring buffer of (frame_idx, distance)
+        count (int): Number of valid samples in history
+        head (int): Index the next sample will be written to
+        fps (float): Video frame rate
+    
+    Returns:
+        float: Mean speed in m/s, or NaN if no valid sample pairs
+    """
+    window = history.shape[0]
+    total = 0.0
+    n_speeds = 0
+    # Walk the samples oldest to newest
+    prev = (head - count) % window
+    for i in range(1, count):
+        cur = (head - count + i) % window
+        dt = (history[cur, 0] - history[prev, 0]) / fps
+        if dt > 0:
+            total += (history[cur, 1] - history[prev, 1]) / dt
+            n_speeds += 1
+        prev = cur
+    if n_speeds == 0:
+        return np.nan
+    return total / n_speeds
+
+
+if NUMBA_AVAILABLE:
+    # Compile (or load from the on-disk cache) at import with the argument types
+    # used by update, instead of stalling the first sampled frame with someone in the zone
+    distances_from_heights(np.ones(1, dtype=np.float64), K)
+    _speed_kernel(np.zeros((WINDOW, 2), dtype=np.float64), 2, 0, float(FPS))
+
+
+def estimate_speed(slot, frame_idx, distance, history, counts, heads):
     """
     Estimate speed of person based on distance history.
     
     Args:
-        track_id: Unique tracking ID
+        slot: Row of the history table assigned to the track
         frame_idx: Current frame index
         distance: Current distance in meters
-        track_history: Dictionary of track_id -> [(frame_idx, distance)]
+        history: (tracks, WINDOW, 2) table of ring buffers of (frame_idx, distance)
+        counts: (tracks,) array of the number of valid samples in each ring buffer
+        heads: (tracks,) array of the index of the next write in each ring buffer
     
     Returns:
         float: Estimated speed in m/s, or None if insufficient data
     """
-    history = track_history[track_id]
-    history.append((frame_idx, distance))
+    buffer = history[slot]
+    head = int(heads[slot])
     
-    # Keep last N frames
-    WINDOW = 8
-    if len(history) > WINDOW:
-        history.pop(0)
+    # Overwrite the oldest sample once the window is full
+    buffer[head, 0] = frame_idx
+    buffer[head, 1] = distance
+    head = (head + 1) % WINDOW
+    count = min(int(counts[slot]) + 1, WINDOW)
+    heads[slot] = head
+    counts[slot] = count
     
-    if len(history) < 2:
+    if count < 2:
         return None
     
-    speeds = []
-    for i in range(1, len(history)):
-        f0, d0 = history[i - 1]
-        f1, d1 = history[i]
-        
-        dt = (f1 - f0) / FPS
-        if dt > 0:
-            speeds.append((d1 - d0) / dt)
-    
-    if not speeds:
+    speed = _speed_kernel(buffer, count, head, float(FPS))
+    if np.isnan(speed):
         return None
+    return float(speed)
+
+
+def extract_boxes(detection_results):
+    """
+    Copy all boxes and track IDs from YOLO results to the CPU in one transfer.
+    
+    Reads the packed boxes.data tensor ([x1, y1, x2, y2, (id,) conf, cls] per
+    row) instead of converting xyxy and id separately or box by box, so the
+    device is synchronized once per frame rather than once per detection.
+    
+    Args:
+        detection_results: YOLO detection results
+    
+    Returns:
+        tuple: (xyxy, ids) where xyxy is an (N, 4) float32 array and ids is an
+            (N,) int64 array, or None if the detections are not tracked
+    """
+    boxes = detection_results.boxes
+    if boxes is None or len(boxes) == 0:
+        return np.empty((0, 4), dtype=np.float32), None
+    
+    data = boxes.data.detach().cpu().numpy()
+    xyxy = data[:, :4].astype(np.float32)
+    ids = data[:, 4].astype(np.int64) if boxes.is_track else None
+    return xyxy, ids
+
+
+def format_timestamp_ms(timestamp):
+    """
+    Format a Unix timestamp as local time with milliseconds.
+    
+    Args:
+        timestamp (float): Unix timestamp in seconds
+    
+    Returns:
+        str: Time formatted as YYYY-MM-DD HH:MM:SS.mmm
+    """
+    milliseconds = int((timestamp - int(timestamp)) * 1000)
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(timestamp)) + f".{milliseconds:03d}"
+
+
+def format_alert_message(alert):
+    """
+    Build the console message for an alert.
     
-    return sum(speeds) / len(speeds)
+    Alerts only carry structured fields; the message is formatted here, when
+    it is actually needed, rather than for every alert in the update loop.
+    
+    Args:
+        alert (dict): Alert dictionary from ZoneAlertManager.update
+    
+    Returns:
+        str: Human readable alert message
+    """
+    track_id = alert['track_id']
+    if alert['type'] == 'ENTRY':
+        return f"🚨 ALERT! Person (ID: {track_id}) entered danger zone!"
+    return (f"⚠ Person (ID: {track_id}) left danger zone "
+            f"(Duration: {alert.get('duration', 0):.2f}s, Distance: {alert.get('distance', 0):.2f}m)")
 
 
 class PersonInZone:
     """Represents a person detected in the danger zone"""
     
+    __slots__ = ('track_id', 'entry_time', 'exit_time', 'duration', 'alert_shown',
+                 'last_speed', 'last_distance', 'total_distance', 'prev_distance')
+    
     def __init__(self, track_id, entry_time):
         """
         Initialize a person in zone record.
@@ -155,70 +290,140 @@ class ZoneAlertManager:
         """
         self.tracker = quadrilateral_tracker
         self.persons_in_zone = {}  # {track_id: PersonInZone}
-        self.alert_history = []  # List of all zone violation records
-        self.current_in_zone = {}  # {track_id: True/False}
+        self._active_in_zone = set()  # Track IDs currently in the zone
+        
+        # Zone violation history as parallel arrays, see alert_history
+        self._init_history_arrays()
         
         # Speed tracking
-        self.track_history = defaultdict(list)  # {track_id: [(frame_idx, distance)]}
+        self._init_speed_slots()
         self.frame_idx = 0  # Current frame index
+        self._next_speed_frame = 0  # Frame index of the next speed sample
+        
+        # Label text sizes, {label: (width, height)}
+        self._text_size_cache = {}
+        
+        # Pre-rendered alert banners, {count: (image, mask)}
+        self._alert_banners = {}
+        
+        # A single worker draws frames in submission order and is the only
+        # user of the text size and banner caches
+        self._annotator = ThreadPoolExecutor(max_workers=1, thread_name_prefix="zone-annotator")
     
-    def update(self, detection_results, frame):
+    def update(self, detection_results, frame, box_scale=None, frame_idx=None):
         """
         Update zone detection based on YOLO detection results.
         
+        Annotations are drawn directly on frame; pass a copy if the original
+        frame is still needed.
+        
+        Args:
+            detection_results: YOLO detection results
+            frame (np.ndarray): Current video frame (modified in place)
+            box_scale (tuple): (x, y) factors mapping box coordinates to frame
+                coordinates, when inference ran on a resized copy of the frame
+            frame_idx (int): Position of the frame in the video, when frames may
+                have been skipped (defaults to counting update calls)
+        
+        Returns:
+            tuple: (annotated_frame, alerts_triggered), where annotated_frame is frame
+        """
+        annotation, alerts_triggered = self.update_async(detection_results, frame,
+                                                         box_scale=box_scale,
+                                                         frame_idx=frame_idx)
+        return annotation.result(), alerts_triggered
+    
+    def update_async(self, detection_results, frame, box_scale=None, frame_idx=None):
+        """
+        Update zone detection and draw the annotations on a worker thread.
+        
+        Tracking state and alerts are updated before returning; only the
+        OpenCV drawing is left to the worker, so it overlaps with whatever the
+        caller does next (e.g. updating the following frame). The frame must
+        not be used until the returned future has completed.
+        
         Args:
             detection_results: YOLO detection results
-            frame (np.ndarray): Current video frame
+            frame (np.ndarray): Current video frame (modified in place)
+            box_scale (tuple): (x, y) factors mapping box coordinates to frame
+                coordinates, when inference ran on a resized copy of the frame
+            frame_idx (int): Position of the frame in the video, when frames may
+                have been skipped (defaults to counting update calls)
         
         Returns:
-            tuple: (annotated_frame, alerts_triggered)
+            tuple: (annotation, alerts_triggered), where annotation is a Future
+                resolving to the annotated frame
         """
-        annotated_frame = frame.copy()
         alerts_triggered = []
         current_time = time.time()
         
+        if frame_idx is not None:
+            self.frame_idx = frame_idx
+        
+        # Sample speed every FRAME_SKIP frames; compare against the next due
+        # frame rather than a modulo so dropped frames can't skip a sample
+        sample_speed = self.frame_idx >= self._next_speed_frame
+        if sample_speed:
+            self._next_speed_frame = self.frame_idx + FRAME_SKIP
+        
         # Track which IDs were detected in this frame
         detected_ids = set()
         
+        # Boxes, points and labels are collected here and drawn after the
+        # loop, so each primitive type takes as few OpenCV calls as possible
+        in_zone_rects = []
+        out_zone_rects = []
+        centers = []
+        labels = []
+        
         # Process each detection
-        if detection_results.boxes is not None:
-            for box in detection_results.boxes:
-                bbox = box.xyxy[0].cpu().numpy()
-                track_id = int(box.id[0]) if box.id is not None else None
-                
+        xyxy, ids = extract_boxes(detection_results)
+        
+        # Only the CPU copies are used from here on; drop the reference so the
+        # device tensors can be released before the frame is processed
+        detection_results = None
+        
+        if len(xyxy) > 0:
+            if box_scale is not None:
+                scale_x, scale_y = box_scale
+                xyxy = xyxy * np.array([scale_x, scale_y, scale_x, scale_y], dtype=xyxy.dtype)
+            if ids is None:
+                ids = [None] * len(xyxy)
+            
+            # Check every detection against the zone in a single batched call
+            bottom_centers = self.tracker.bbox_bottom_centers(xyxy)
+            in_zone_flags = self.tracker.points_in_zone(bottom_centers)
+            
+            # Estimate distance ONLY for detections in zone, all at once, and only
+            # on sampling frames; other frames reuse each person's last values
+            distances = np.full(len(xyxy), np.nan)
+            if sample_speed and in_zone_flags.any():
+                heights = (xyxy[in_zone_flags, 3] - xyxy[in_zone_flags, 1]).astype(np.float64)
+                distances[in_zone_flags] = distances_from_heights(heights, K)
+            
+            for bbox, track_id, bottom_center, is_in_zone, distance in zip(
+                    xyxy, ids, bottom_centers, in_zone_flags, distances):
                 if track_id is not None:
+                    track_id = int(track_id)
                     detected_ids.add(track_id)
                 
-                # Check if in zone first
-                is_in_zone = self.tracker.is_bbox_in_zone(bbox)
+                distance = None if np.isnan(distance) else float(distance)
                 
-                # Estimate distance ONLY if in zone
-                distance = None
-                if is_in_zone:
-                    distance = estimate_distance_from_bbox(bbox)
-                
-                # Draw bounding box and labels
-                x1, y1, x2, y2 = map(int, bbox)
+                x1, y1 = int(bbox[0]), int(bbox[1])
                 
                 if is_in_zone:
                     # Red box for persons in zone
                     box_color = (0, 0, 255)
+                    in_zone_rects.append(bbox)
                 else:
                     # Green box for persons outside zone
                     box_color = (0, 255, 0)
-                
-                # Draw bounding box
-                cv2.rectangle(annotated_frame, (x1, y1), (x2, y2), box_color, 2)
+                    out_zone_rects.append(bbox)
                 
                 # Prepare label
                 label_parts = [f"ID {track_id}"] if track_id is not None else []
                 
                 if is_in_zone:
-                    # Draw the bottom center point in red
-                    annotated_frame = self.tracker.draw_bbox_bottom_center(
-                        annotated_frame, bbox, color=(0, 0, 255), radius=8
-                    )
-                    
                     # Handle first time entering zone
                     if track_id is not None:
                         if track_id not in self.persons_in_zone:
@@ -227,15 +432,15 @@ class ZoneAlertManager:
                             alerts_triggered.append({
                                 'type': 'ENTRY',
                                 'track_id': track_id,
-                                'timestamp': current_time,
-                                'message': f"🚨 ALERT! Person (ID: {track_id}) entered danger zone!"
+                                'timestamp': current_time
                             })
                         
-                        self.current_in_zone[track_id] = True
+                        self._active_in_zone.add(track_id)
                         
-                        # Calculate distance and speed for persons in zone
+                        person = self.persons_in_zone[track_id]
+                        
+                        # Calculate distance and speed for persons in zone (sampling frames only)
                         if distance is not None:
-                            person = self.persons_in_zone[track_id]
                             person.last_distance = distance
                             
                             # Accumulate total distance traveled in zone
@@ -245,121 +450,275 @@ class ZoneAlertManager:
                             
                             person.prev_distance = distance
                             
-                            if self.frame_idx % FRAME_SKIP == 0:
-                                speed = estimate_speed(track_id, self.frame_idx, distance, self.track_history)
-                                if speed is not None:
-                                    person.last_speed = speed
-                            
+                            speed = estimate_speed(self._speed_slot(track_id),
+                                                   self.frame_idx, distance,
+                                                   self._speed_buf, self._speed_count,
+                                                   self._speed_head)
+                            if speed is not None:
+                                person.last_speed = speed
+                        
+                        if person.last_distance is not None:
                             # Add distance to label
-                            label_parts.append(f"{distance:.2f}m")
+                            label_parts.append(f"{person.last_distance:.2f}m")
                             
                             # Add speed to label if available
                             if person.last_speed is not None:
                                 label_parts.append(f"{abs(person.last_speed):.2f}m/s")
                 
                 else:
-                    # Draw the bottom center point in green
-                    annotated_frame = self.tracker.draw_bbox_bottom_center(
-                        annotated_frame, bbox, color=(0, 255, 0), radius=6
-                    )
-                    
                     if track_id is not None:
-                        self.current_in_zone[track_id] = False
+                        self._active_in_zone.discard(track_id)
+                        self._free_speed_slot(track_id)
                 
-                # Draw label
-                label = " | ".join(label_parts)
-                text_size = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 2)[0]
-                cv2.rectangle(annotated_frame, (x1, y1 - 25), (x1 + text_size[0] + 5, y1), box_color, -1)
-                cv2.putText(
-                    annotated_frame,
-                    label,
-                    (x1 + 2, y1 - 8),
-                    cv2.FONT_HERSHEY_SIMPLEX,
-                    0.6,
-                    (0, 255, 255),
-                    2
-                )
+                centers.append((int(bottom_center[0]), int(bottom_center[1]), bool(is_in_zone)))
+                labels.append((" | ".join(label_parts), x1, y1, box_color))
         
         # Check for persons who left the zone
-        for track_id in list(self.persons_in_zone.keys()):
-            if track_id not in detected_ids and self.current_in_zone.get(track_id, False):
-                # Person left the zone
-                person = self.persons_in_zone[track_id]
-                person.mark_exit(current_time)
-                
-                duration = person.get_duration()
-                self.current_in_zone[track_id] = False
-                
-                alerts_triggered.append({
-                    'type': 'EXIT',
-                    'track_id': track_id,
-                    'timestamp': current_time,
-                    'duration': duration,
-                    'distance': person.total_distance,
-                    'message': f"⚠ Person (ID: {track_id}) left danger zone (Duration: {duration:.2f}s, Distance: {person.total_distance:.2f}m)"
-                })
-                
-                # Add to history
-                self.alert_history.append({
-                    'track_id': track_id,
-                    'entry_time': person.entry_time,
-                    'exit_time': person.exit_time,
-                    'duration': duration,
-                    'entry_datetime': datetime.fromtimestamp(person.entry_time),
-                    'exit_datetime': datetime.fromtimestamp(person.exit_time),
-                    'max_speed': person.last_speed,
-                    'last_distance': person.last_distance,
-                    'total_distance': person.total_distance
-                })
+        for track_id in sorted(self._active_in_zone - detected_ids):
+            # Person left the zone
+            person = self.persons_in_zone[track_id]
+            person.mark_exit(current_time)
+            
+            duration = person.get_duration()
+            self._active_in_zone.discard(track_id)
+            self._free_speed_slot(track_id)
+            
+            alerts_triggered.append({
+                'type': 'EXIT',
+                'track_id': track_id,
+                'timestamp': current_time,
+                'duration': duration,
+                'distance': person.total_distance
+            })
+            
+            # Add to history
+            self._add_history_record(person, duration)
         
-        # Draw alert text if anyone is in zone
-        persons_in_zone_count = sum(1 for v in self.current_in_zone.values() if v)
-        if persons_in_zone_count > 0:
-            annotated_frame = self._draw_alert_text(annotated_frame, persons_in_zone_count)
+        # Draw on the annotation worker, which only needs this frame's snapshot
+        annotation = self._annotator.submit(self._annotate_frame, frame, in_zone_rects,
+                                            out_zone_rects, centers, labels,
+                                            len(self._active_in_zone))
         
         # Increment frame counter
         self.frame_idx += 1
         
-        return annotated_frame, alerts_triggered
+        return annotation, alerts_triggered
+    
+    def _annotate_frame(self, frame, in_zone_rects, out_zone_rects, centers, labels,
+                        persons_in_zone_count):
+        """
+        Draw boxes, bottom center points, labels and the alert banner on a frame.
+        
+        Runs on the annotation worker thread; the arguments are a snapshot
+        taken by update_async, so no tracking state is read here.
+        
+        Args:
+            frame (np.ndarray): Video frame (modified in place)
+            in_zone_rects (list): Bounding boxes of persons in the zone
+            out_zone_rects (list): Bounding boxes of persons outside the zone
+            centers (list): (x, y, is_in_zone) bottom center point of each detection
+            labels (list): (label, x1, y1, box_color) label of each detection
+            persons_in_zone_count (int): Number of persons in zone
+        
+        Returns:
+            np.ndarray: The same frame with annotations
+        """
+        # Draw all bounding boxes of each color in a single call
+        self._draw_boxes(frame, in_zone_rects, (0, 0, 255))
+        self._draw_boxes(frame, out_zone_rects, (0, 255, 0))
+        
+        # Draw the bottom center points (red in zone, green outside)
+        for x, y, is_in_zone in centers:
+            if is_in_zone:
+                cv2.circle(frame, (x, y), 8, (0, 0, 255), -1)
+            else:
+                cv2.circle(frame, (x, y), 6, (0, 255, 0), -1)
+        
+        # Draw labels on top of the boxes
+        for label, x1, y1, box_color in labels:
+            text_size = self._text_size(label)
+            cv2.rectangle(frame, (x1, y1 - 25), (x1 + text_size[0] + 5, y1), box_color, -1)
+            cv2.putText(
+                frame,
+                label,
+                (x1 + 2, y1 - 8),
+                cv2.FONT_HERSHEY_SIMPLEX,
+                0.6,
+                (0, 255, 255),
+                2
+            )
+        
+        # Draw alert text if anyone is in zone
+        if persons_in_zone_count > 0:
+            frame = self._draw_alert_text(frame, persons_in_zone_count)
+        
+        return frame
+    
+    def _init_speed_slots(self):
+        """Allocate an empty speed history table"""
+        self._speed_buf = np.zeros((MAX_TRACKS, WINDOW, 2), dtype=np.float64)  # Ring buffers of (frame_idx, distance)
+        self._speed_head = np.zeros(MAX_TRACKS, dtype=np.int32)  # Next write index per slot
+        self._speed_count = np.zeros(MAX_TRACKS, dtype=np.int32)  # Valid samples per slot
+        self._id_to_slot = {}  # {track_id: slot}
+        self._free_slots = list(range(MAX_TRACKS - 1, -1, -1))  # Unused slots, lowest last
+    
+    def _speed_slot(self, track_id):
+        """
+        Get the speed history slot of a track, allocating one on first sight.
+        
+        Args:
+            track_id (int): Unique tracking ID
+        
+        Returns:
+            int: Row of the speed history table
+        """
+        slot = self._id_to_slot.get(track_id)
+        if slot is None:
+            if not self._free_slots:
+                # Double the table when every slot is in use
+                capacity = self._speed_buf.shape[0]
+                self._speed_buf = np.concatenate([self._speed_buf, np.zeros_like(self._speed_buf)])
+                self._speed_head = np.concatenate([self._speed_head, np.zeros_like(self._speed_head)])
+                self._speed_count = np.concatenate([self._speed_count, np.zeros_like(self._speed_count)])
+                self._free_slots = list(range(2 * capacity - 1, capacity - 1, -1))
+            slot = self._free_slots.pop()
+            self._speed_head[slot] = 0
+            self._speed_count[slot] = 0
+            self._id_to_slot[track_id] = slot
+        return slot
+    
+    def _free_speed_slot(self, track_id):
+        """
+        Release the speed history slot of a track.
+        
+        Args:
+            track_id (int): Unique tracking ID
+        """
+        slot = self._id_to_slot.pop(track_id, None)
+        if slot is not None:
+            self._free_slots.append(slot)
+    
+    def _text_size(self, label):
+        """
+        Get the rendered size of a bbox label, cached by label string.
+        
+        Args:
+            label (str): Label text
+        
+        Returns:
+            tuple: (width, height) in pixels
+        """
+        size = self._text_size_cache.get(label)
+        if size is None:
+            # Labels include distance/speed values, so drop everything once the cache is full
+            if len(self._text_size_cache) >= TEXT_SIZE_CACHE_LIMIT:
+                self._text_size_cache.clear()
+            size = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 2)[0]
+            self._text_size_cache[label] = size
+        return size
+    
+    @staticmethod
+    def _draw_boxes(frame, boxes, color):
+        """
+        Draw bounding boxes of one color with a single polylines call.
+        
+        Args:
+            frame (np.ndarray): Frame to draw on (modified in place)
+            boxes (list): Bounding boxes as [x1, y1, x2, y2]
+            color (tuple): BGR color
+        """
+        if not boxes:
+            return
+        
+        rects = np.asarray(boxes).astype(np.int32)
+        x1, y1, x2, y2 = rects[:, 0], rects[:, 1], rects[:, 2], rects[:, 3]
+        
+        # Corners of every box as an (N, 4, 2) array of closed polygons
+        corners = np.stack([
+            np.stack([x1, y1], axis=1),
+            np.stack([x2, y1], axis=1),
+            np.stack([x2, y2], axis=1),
+            np.stack([x1, y2], axis=1),
+        ], axis=1)
+        cv2.polylines(frame, list(corners), True, color, 2)
+    
+    def _get_alert_banner(self, count):
+        """
+        Get the alert banner for a person count, rendering it on first use.
+        
+        The banner is drawn once onto a blank canvas anchored at the frame
+        origin, along with a mask of the pixels it covers, so later frames
+        only need a masked copy instead of re-rasterizing the text.
+        
+        Args:
+            count (int): Number of persons in zone
+        
+        Returns:
+            tuple: (image, mask) where image is the rendered banner and mask is
+                a boolean array of the pixels to copy onto the frame
+        """
+        banner = self._alert_banners.get(count)
+        if banner is None:
+            if len(self._alert_banners) >= ALERT_BANNER_CACHE_LIMIT:
+                self._alert_banners.clear()
+            
+            text = f"🚨 DANGER ZONE! {count} person(s) in zone"
+            (text_width, _), _ = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, 1.2, 2)
+            
+            # The text can run past the background box, so size the canvas to fit both
+            height = 72
+            width = max(402, 20 + text_width + 2)
+            image = np.zeros((height, width, 3), dtype=np.uint8)
+            mask = np.zeros((height, width), dtype=np.uint8)
+            
+            for canvas, background, foreground in ((image, (0, 0, 255), (255, 255, 255)),
+                                                   (mask, 255, 255)):
+                # Draw red alert background
+                cv2.rectangle(canvas, (10, 10), (400, 70), background, -1)
+                cv2.rectangle(canvas, (10, 10), (400, 70), background, 2)
+                
+                # Draw alert text
+                cv2.putText(canvas, text, (20, 50),
+                           cv2.FONT_HERSHEY_SIMPLEX, 1.2, foreground, 2)
+            
+            banner = self._alert_banners[count] = (image, mask.astype(bool))
+        return banner
     
     def _draw_alert_text(self, frame, count):
         """
         Draw alert text on frame showing persons in zone.
         
         Args:
-            frame (np.ndarray): Video frame
+            frame (np.ndarray): Video frame (modified in place)
             count (int): Number of persons in zone
         
         Returns:
-            np.ndarray: Frame with alert text
+            np.ndarray: The same frame with alert text
         """
-        result = frame.copy()
-        
-        # Draw red alert background
-        cv2.rectangle(result, (10, 10), (400, 70), (0, 0, 255), -1)
-        cv2.rectangle(result, (10, 10), (400, 70), (0, 0, 255), 2)
+        image, mask = self._get_alert_banner(count)
         
-        # Draw alert text
-        text = f"🚨 DANGER ZONE! {count} person(s) in zone"
-        cv2.putText(result, text, (20, 50),
-                   cv2.FONT_HERSHEY_SIMPLEX, 1.2, (255, 255, 255), 2)
+        # Clip the banner to frames smaller than it
+        height = min(image.shape[0], frame.shape[0])
+        width = min(image.shape[1], frame.shape[1])
+        np.copyto(frame[:height, :width], image[:height, :width],
+                  where=mask[:height, :width, np.newaxis])
         
-        return result
+        return frame
     
     def log_alert(self, alert):
         """
         Log an alert to console with timestamp.
         
         Args:
-            alert (dict): Alert dictionary with message and metadata
+            alert (dict): Alert dictionary with type, track_id, timestamp and metadata
         """
         timestamp = datetime.fromtimestamp(alert['timestamp']).strftime("%H:%M:%S")
         
         if alert['type'] == 'ENTRY':
-            print(f"[{timestamp}] {alert['message']}")
+            print(f"[{timestamp}] {format_alert_message(alert)}")
         elif alert['type'] == 'EXIT':
             duration = alert.get('duration', 0)
-            print(f"[{timestamp}] {alert['message']}")
+            print(f"[{timestamp}] {format_alert_message(alert)}")
             print(f"        └─ Time in zone: {duration:.2f} seconds")
     
     def get_statistics(self):
@@ -369,20 +728,70 @@ class ZoneAlertManager:
         Returns:
             dict: Statistics including total violations, average duration, etc.
         """
-        total_violations = len(self.alert_history)
-        total_persons = len(set(record['track_id'] for record in self.alert_history)) if self.alert_history else 0
-        durations = [record['duration'] for record in self.alert_history]
-        average_duration = sum(durations) / len(durations) if durations else 0
+        total_violations = self._hist_size
+        track_ids = self._history['track_id'][:total_violations]
+        durations = self._history['duration'][:total_violations]
         
         return {
             'total_violations': total_violations,
-            'total_persons': total_persons,
-            'average_duration': average_duration,
-            'max_duration': max(durations) if durations else 0,
-            'min_duration': min(durations) if durations else 0,
+            'total_persons': int(np.unique(track_ids).size),
+            'average_duration': float(durations.mean()) if total_violations else 0,
+            'max_duration': float(durations.max()) if total_violations else 0,
+            'min_duration': float(durations.min()) if total_violations else 0,
             'violations': self.alert_history
         }
     
+    @property
+    def alert_history(self):
+        """
+        List of all zone violation records, built from the history arrays.
+        
+        Returns:
+            list: One dict per violation with track_id, entry_time, exit_time,
+                duration, max_speed, last_distance and total_distance
+                (max_speed and last_distance are None when never measured)
+        """
+        columns = [self._history[name][:self._hist_size].tolist() for name, _ in HISTORY_FIELDS]
+        records = []
+        for values in zip(*columns):
+            record = dict(zip((name for name, _ in HISTORY_FIELDS), values))
+            for name in ('max_speed', 'last_distance'):
+                if np.isnan(record[name]):
+                    record[name] = None
+            records.append(record)
+        return records
+    
+    def _init_history_arrays(self):
+        """Allocate empty violation history arrays"""
+        self._hist_size = 0  # Number of valid records in the arrays
+        self._history = {name: np.empty(HISTORY_INITIAL_CAPACITY, dtype=dtype)
+                         for name, dtype in HISTORY_FIELDS}  # {field: array}
+    
+    def _add_history_record(self, person, duration):
+        """
+        Add a zone violation record to the history.
+        
+        Args:
+            person (PersonInZone): Person who left the zone
+            duration (float): Time spent in the zone in seconds
+        """
+        # Double the arrays when full so appends stay amortized O(1)
+        if self._hist_size == self._history['track_id'].shape[0]:
+            for name, array in self._history.items():
+                grown = np.empty(2 * self._hist_size, dtype=array.dtype)
+                grown[:self._hist_size] = array
+                self._history[name] = grown
+        
+        i = self._hist_size
+        self._history['track_id'][i] = person.track_id
+        self._history['entry_time'][i] = person.entry_time
+        self._history['exit_time'][i] = person.exit_time
+        self._history['duration'][i] = duration
+        self._history['max_speed'][i] = np.nan if person.last_speed is None else person.last_speed
+        self._history['last_distance'][i] = np.nan if person.last_distance is None else person.last_distance
+        self._history['total_distance'][i] = person.total_distance
+        self._hist_size += 1
+    
     def finalize_zone_exits(self, current_time=None):
         """
         Mark all persons still in zone as exited (call at video end).
@@ -400,23 +809,15 @@ class ZoneAlertManager:
                 duration = person.get_duration()
                 
                 # Add to history
-                self.alert_history.append({
-                    'track_id': track_id,
-                    'entry_time': person.entry_time,
-                    'exit_time': person.exit_time,
-                    'duration': duration,
-                    'entry_datetime': datetime.fromtimestamp(person.entry_time),
-                    'exit_datetime': datetime.fromtimestamp(person.exit_time),
-                    'max_speed': person.last_speed,
-                    'total_distance': person.total_distance
-                })
+                self._add_history_record(person, duration)
                 
                 print(f"[{datetime.fromtimestamp(current_time).strftime('%H:%M:%S')}] ⚠ Person (ID: {track_id}) still in danger zone (Duration: {duration:.2f}s, Distance: {person.total_distance:.2f}m) - Video ended")
     
     def print_statistics(self):
         """Print detailed violation information to console"""
         
-        if not self.alert_history:
+        total_violations = self._hist_size
+        if total_violations == 0:
             print("\n" + "=" * 80)
             print("NO DANGER ZONE VIOLATIONS DETECTED")
             print("=" * 80 + "\n")
@@ -426,37 +827,44 @@ class ZoneAlertManager:
         print("DANGER ZONE VIOLATION DETAILS")
         print("=" * 80)
         
-        for i, violation in enumerate(self.alert_history, 1):
-            entry_dt = violation['entry_datetime']
-            exit_dt = violation['exit_datetime']
-            duration = violation['duration']
-            max_speed = violation.get('max_speed', None)
-            total_distance = violation.get('total_distance', 0)
+        history = self._history
+        for i in range(total_violations):
+            track_id = int(history['track_id'][i])
+            duration = float(history['duration'][i])
+            duration_sec = int(duration)
+            duration_ms = int((duration - duration_sec) * 1000)
+            max_speed = float(history['max_speed'][i])
+            total_distance = float(history['total_distance'][i])
             
-            # Format with full timestamp including microseconds for precision
-            entry_time_str = entry_dt.strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]  # milliseconds
-            exit_time_str = exit_dt.strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]    # milliseconds
+            # Format with full timestamp including milliseconds for precision
+            entry_time_str = format_timestamp_ms(float(history['entry_time'][i]))
+            exit_time_str = format_timestamp_ms(float(history['exit_time'][i]))
             
-            print(f"\nViolation #{i}")
+            print(f"\nViolation #{i + 1}")
             print("-" * 80)
-            print(f"Person ID:         {violation['track_id']}")
+            print(f"Person ID:         {track_id}")
             print(f"Entry Time:        {entry_time_str}")
             print(f"Exit Time:         {exit_time_str}")
-            print(f"Duration:          {duration:.2f} seconds ({int(duration)} sec {int((duration % 1) * 1000)} ms)")
+            print(f"Duration:          {duration:.2f} seconds ({duration_sec} sec {duration_ms} ms)")
             print(f"Distance Traveled: {total_distance:.2f} meters")
             
             # Print speed information if available
-            if max_speed is not None:
+            if not np.isnan(max_speed):
                 print(f"Max Speed:         {abs(max_speed):.2f} m/s ({abs(max_speed) * 3.6:.2f} km/h)")
         
         print("\n" + "=" * 80)
-        print(f"Total Violations: {len(self.alert_history)}")
+        print(f"Total Violations: {total_violations}")
         print("=" * 80 + "\n")
     
+    def close(self):
+        """Wait for pending annotations and stop the annotation worker"""
+        self._annotator.shutdown(wait=True)
+    
     def reset(self):
         """Reset all tracking data"""
         self.persons_in_zone = {}
-        self.current_in_zone = {}
-        self.alert_history = []
-        self.track_history = defaultdict(list)
+        self._active_in_zone = set()
+        self._init_history_arrays()
+        self._init_speed_slots()
         self.frame_idx = 0
+        self._next_speed_frame = 0